@@ -3,37 +3,93 @@ ESP32-CAM QR Code Scanner with Web Integration
 Monitors Firebase, detects QR codes, opens URLs, and sends data to website
 """
 
+import sys
 import cv2
 import numpy as np
 import requests
-import base64
+import pybase64
 import webbrowser
 import time
-import json
+import orjson
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import chain
+from operator import attrgetter
 from pyzbar import pyzbar
 from urllib.parse import urlparse
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 
 # Firebase Configuration
 FIREBASE_URL = "https://smart-glasses-ff6d1-default-rtdb.asia-southeast1.firebasedatabase.app"
 CAMERA_PATH = "/smartglasses/camera.json"
 QR_RESULTS_PATH = "/smartglasses/qr_detections"
 
+# Built once - these never change at runtime
+CAMERA_URL = f"{FIREBASE_URL}{CAMERA_PATH}"
+QR_RESULTS_URL = f"{FIREBASE_URL}{QR_RESULTS_PATH}.json"
+
 # Settings
 CHECK_INTERVAL = 0.5
+MAX_SCAN_EDGE = 640  # Downscale larger frames before QR scanning
 SHOW_PREVIEW = True
 SCAN_COOLDOWN = 5
 AUTO_OPEN_URLS = True  # Automatically open URLs in browser
 SEND_TO_WEB = True     # Send QR data to website
+USE_PYZBAR_FALLBACK = True  # Retry with pyzbar (covers non-QR barcode types)
+
+# Reuse one HTTPS connection for all Firebase traffic instead of a new
+# TCP+TLS handshake every poll
+SESSION = requests.Session()
+SESSION.headers.update({'Connection': 'keep-alive'})
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+REQUEST_TIMEOUT = (2, 5)  # (connect, read) seconds
+
+# Detections queue here and a background thread uploads them, so the
+# scanner never blocks on an HTTPS round-trip
+SEND_QUEUE = queue.Queue()
+SEND_BATCH_SIZE = 10
+
+# The preview runs on its own thread so GUI redraw never blocks the
+# decode loop; macOS requires GUI calls on the main thread, so fall
+# back to inline imshow there
+PREVIEW_THREADED = sys.platform != 'darwin'
+PREVIEW_QUEUE = queue.Queue(maxsize=1)
+STOP_EVENT = threading.Event()
+WINDOW_NAME = 'ESP32-CAM QR Scanner'
+
+# Kept in oldest-first scan order so cleanup can stop at the first
+# entry that hasn't expired yet
+recent_qrs = OrderedDict()
+
+# Reused by the sharpening step in scan_qr_codes
+ERODE_KERNEL = np.ones((3, 3), np.uint8)
+
+# OpenCV's QR detector is SIMD-vectorized and far lighter on memory
+# than libzbar, so it runs first on every frame
+DETECTOR = cv2.QRCodeDetector()
+
+# Pulls (x, y) off polygon points without a per-point Python loop body
+GET_XY = attrgetter('x', 'y')
 
-recent_qrs = {}
+# The instruction line never changes, so rasterize it once at startup
+# and blit it into the frame instead of re-running putText every frame
+INSTRUCTIONS_IMG = np.zeros((20, 200, 3), np.uint8)
+cv2.putText(INSTRUCTIONS_IMG, "Press 'Q' to quit", (0, 15),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+INSTRUCTIONS_IMG_GRAY = cv2.cvtColor(INSTRUCTIONS_IMG, cv2.COLOR_BGR2GRAY)
 
 def fetch_camera_frame():
     """Fetch the latest camera frame from Firebase"""
     try:
-        response = requests.get(f"{FIREBASE_URL}{CAMERA_PATH}")
+        response = SESSION.get(CAMERA_URL, timeout=REQUEST_TIMEOUT)
         if response.status_code == 200:
-            data = response.json()
+            # orjson's C parser chews through the multi-KB base64 string
+            # far faster than stdlib json
+            data = orjson.loads(response.content)
             if data and 'frame' in data:
                 return data['frame'], data.get('timestamp', 'unknown')
         return None, None
@@ -41,14 +97,51 @@ def fetch_camera_frame():
         print(f"❌ Error fetching frame: {e}")
         return None, None
 
-def decode_frame(base64_string):
-    """Decode base64 image to OpenCV format"""
+def stream_camera_frames():
+    """Stream camera updates from Firebase via REST event-stream.
+
+    Holds one long-lived connection and yields (frame_base64, timestamp)
+    only when Firebase pushes an update - no polling in between.
+    """
+    headers = {'Accept': 'text/event-stream'}
+    # Firebase emits a keep-alive event roughly every 30s, so a finite
+    # read timeout distinguishes a dead connection from a quiet one and
+    # lets the reconnect path run instead of blocking forever
+    with SESSION.get(CAMERA_URL, headers=headers,
+                     stream=True, timeout=(2, 60)) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            if line.startswith('event:'):
+                event = line[len('event:'):].strip()
+            elif line.startswith('data:') and event in ('put', 'patch'):
+                message = orjson.loads(line[len('data:'):].strip())
+                if not message or message.get('path') != '/':
+                    continue
+                data = message.get('data')
+                if data and 'frame' in data:
+                    yield data['frame'], data.get('timestamp', 'unknown')
+
+def decode_frame(base64_string, flags=cv2.IMREAD_REDUCED_GRAYSCALE_2):
+    """Decode base64 image to OpenCV format
+
+    Defaults to half-resolution grayscale decoding, which libjpeg fuses
+    into a single IDCT pass - the scanner only needs luminance, so this
+    skips the color conversion and resize entirely. Pass
+    cv2.IMREAD_REDUCED_COLOR_2 or cv2.IMREAD_COLOR when color or full
+    resolution is actually needed.
+    """
     try:
         if ',' in base64_string:
             base64_string = base64_string.split(',')[1]
-        img_bytes = base64.b64decode(base64_string)
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # pybase64 dispatches to SIMD kernels - much faster than stdlib
+        # base64 - and the mutable bytearray lets NumPy view the buffer
+        # without an extra copy
+        buf = pybase64.b64decode_as_bytearray(base64_string, validate=True)
+        nparr = np.frombuffer(buf, np.uint8)
+        img = cv2.imdecode(nparr, flags)
         return img
     except Exception as e:
         print(f"❌ Error decoding frame: {e}")
@@ -57,21 +150,101 @@ def decode_frame(base64_string):
 def scan_qr_codes(frame):
     """Scan frame for QR codes"""
     qr_codes = []
-    detected_codes = pyzbar.decode(frame)
-    
-    for code in detected_codes:
-        qr_data = code.data.decode('utf-8')
-        qr_type = code.type
-        rect = code.rect
-        polygon = code.polygon
-        
+
+    # ZBar's CPU and memory scale with pixel count, so scan a downscaled
+    # copy first and only retry at full resolution if nothing is found
+    scale = 1.0
+    scan_frame = frame
+    long_edge = max(frame.shape[:2])
+    if long_edge > MAX_SCAN_EDGE:
+        scale = MAX_SCAN_EDGE / long_edge
+        scan_frame = cv2.resize(frame, None, fx=scale, fy=scale,
+                                interpolation=cv2.INTER_AREA)
+
+    # The decoders only need luminance - feeding a single-channel image
+    # avoids pushing 3x the bytes through them (frames decoded with a
+    # grayscale imdecode flag arrive single-channel already)
+    if scan_frame.ndim == 3:
+        gray = cv2.cvtColor(scan_frame, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = scan_frame
+
+    # ESP32-CAM frames are often soft/low-contrast; an unsharp mask plus
+    # erode greatly improves first-try detection on blurry frames
+    blur = cv2.GaussianBlur(gray, (0, 0), 8.0)
+    sharp = cv2.addWeighted(gray, 5.0, blur, -4.0, 0)
+    pre = cv2.erode(sharp, ERODE_KERNEL)
+
+    for image in (pre, gray):
+        qr_codes = scan_with_opencv(image)
+        if qr_codes:
+            break
+
+    if not qr_codes and USE_PYZBAR_FALLBACK:
+        for image in (pre, gray):
+            qr_codes = scan_with_pyzbar(image)
+            if qr_codes:
+                break
+
+    if not qr_codes and scale != 1.0:
+        scale = 1.0
+        if frame.ndim == 3:
+            gray_full = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        else:
+            gray_full = frame
+        qr_codes = scan_with_opencv(gray_full)
+        if not qr_codes and USE_PYZBAR_FALLBACK:
+            qr_codes = scan_with_pyzbar(gray_full)
+
+    # Map coordinates back to the full-resolution frame for drawing
+    if qr_codes and scale != 1.0:
+        inv = 1.0 / scale
+        for qr in qr_codes:
+            rect = qr['rect']
+            qr['rect'] = pyzbar.Rect(int(rect.left * inv), int(rect.top * inv),
+                                     int(rect.width * inv), int(rect.height * inv))
+            qr['polygon'] = [pyzbar.Point(int(p.x * inv), int(p.y * inv))
+                             for p in qr['polygon']]
+
+    return qr_codes
+
+def scan_with_opencv(image):
+    """Detect QR codes with cv2.QRCodeDetector"""
+    qr_codes = []
+    retval, decoded_info, points, _ = DETECTOR.detectAndDecodeMulti(image)
+
+    if not retval:
+        return qr_codes
+
+    for qr_data, quad in zip(decoded_info, points):
+        if not qr_data:
+            continue  # Located but not decoded
+
+        # boundingRect only accepts CV_32S/CV_32F point sets
+        quad = quad.astype(np.int32)
+        left, top, width, height = cv2.boundingRect(quad)
+
         qr_codes.append({
             'data': qr_data,
-            'type': qr_type,
-            'rect': rect,
-            'polygon': polygon
+            'type': 'QRCODE',
+            'rect': pyzbar.Rect(left, top, width, height),
+            'polygon': [pyzbar.Point(int(x), int(y)) for x, y in quad]
         })
-    
+
+    return qr_codes
+
+def scan_with_pyzbar(image):
+    """Detect barcodes with pyzbar (handles more symbologies than OpenCV)"""
+    qr_codes = []
+
+    for code in pyzbar.decode(image):
+        qr_codes.append({
+            'data': code.data.decode('utf-8'),
+            'type': code.type,
+            'rect': code.rect,
+            'polygon': code.polygon
+        })
+
     return qr_codes
 
 def draw_qr_codes(frame, qr_codes):
@@ -79,7 +252,8 @@ def draw_qr_codes(frame, qr_codes):
     for qr in qr_codes:
         points = qr['polygon']
         if len(points) == 4:
-            pts = np.array([[p.x, p.y] for p in points], np.int32)
+            pts = np.fromiter(chain.from_iterable(map(GET_XY, points)),
+                              dtype=np.int32, count=2 * len(points))
             pts = pts.reshape((-1, 1, 2))
             cv2.polylines(frame, [pts], True, (0, 255, 0), 3)
         
@@ -96,8 +270,10 @@ def draw_qr_codes(frame, qr_codes):
     
     return frame
 
+@lru_cache(maxsize=1024)
 def is_valid_url(url):
-    """Check if string is a valid URL"""
+    """Check if string is a valid URL (memoized - the same QR tends to
+    stay in view for many frames)"""
     try:
         result = urlparse(url)
         return all([result.scheme, result.netloc])
@@ -115,34 +291,49 @@ def open_url(url):
         return False
 
 def send_to_website(qr_data, qr_type, is_url):
-    """Send QR detection data to Firebase for website display"""
-    try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        payload = {
-            "data": qr_data,
-            "type": qr_type,
-            "is_url": is_url,
-            "timestamp": timestamp,
-            "status": "opened" if (is_url and AUTO_OPEN_URLS) else "detected"
-        }
-        
-        # Push to Firebase (creates unique key)
-        response = requests.post(
-            f"{FIREBASE_URL}{QR_RESULTS_PATH}.json",
-            json=payload
-        )
-        
-        if response.status_code == 200:
-            print(f"✓ Sent to website: {qr_data[:50]}")
-            return True
-        else:
-            print(f"❌ Failed to send to website: {response.status_code}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Error sending to website: {e}")
-        return False
+    """Queue QR detection data for the background Firebase uploader"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    payload = {
+        "data": qr_data,
+        "type": qr_type,
+        "is_url": is_url,
+        "timestamp": timestamp,
+        "status": "opened" if (is_url and AUTO_OPEN_URLS) else "detected"
+    }
+
+    SEND_QUEUE.put(payload)
+    return True
+
+def send_worker():
+    """Drain queued detections and upload them in one Firebase PATCH"""
+    while True:
+        payload = SEND_QUEUE.get()
+
+        # Collect whatever else is already waiting into a single
+        # multi-path update (one unique key per detection)
+        batch = {uuid.uuid4().hex: payload}
+        try:
+            while len(batch) < SEND_BATCH_SIZE:
+                batch[uuid.uuid4().hex] = SEND_QUEUE.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            response = SESSION.patch(
+                QR_RESULTS_URL,
+                data=orjson.dumps(batch),
+                headers={'Content-Type': 'application/json'},
+                timeout=REQUEST_TIMEOUT
+            )
+
+            if response.status_code == 200:
+                print(f"✓ Sent {len(batch)} detection(s) to website")
+            else:
+                print(f"❌ Failed to send to website: {response.status_code}")
+
+        except Exception as e:
+            print(f"❌ Error sending to website: {e}")
 
 def should_process_qr(qr_data):
     """Check if we should process this QR"""
@@ -152,111 +343,262 @@ def should_process_qr(qr_data):
         last_scan_time = recent_qrs[qr_data]
         if current_time - last_scan_time < SCAN_COOLDOWN:
             return False
-    
+
     recent_qrs[qr_data] = current_time
+    recent_qrs.move_to_end(qr_data)
     return True
 
 def clean_old_qrs():
     """Remove old entries from recent_qrs"""
     current_time = time.time()
-    expired_qrs = [qr for qr, timestamp in recent_qrs.items() 
-                   if current_time - timestamp > SCAN_COOLDOWN * 2]
-    for qr in expired_qrs:
-        del recent_qrs[qr]
+    # Entries are oldest-first, so stop at the first one still in cooldown
+    while recent_qrs:
+        timestamp = next(iter(recent_qrs.values()))
+        if current_time - timestamp > SCAN_COOLDOWN * 2:
+            recent_qrs.popitem(last=False)
+        else:
+            break
+
+def process_frame(frame_base64, timestamp, frame_count, qr_count):
+    """Decode, scan, and display a single frame
+
+    Returns (qr_count, keep_running).
+    """
+    frame = decode_frame(frame_base64)
+    reduced = True  # decoded at half the sensor resolution
+
+    if frame is None:
+        return qr_count, True
+
+    qr_codes = scan_qr_codes(frame)
+
+    if not qr_codes:
+        # Half-size decode can lose fine modules on dense codes - retry
+        # once at full resolution before giving up on the frame
+        full_frame = decode_frame(frame_base64, cv2.IMREAD_GRAYSCALE)
+        if full_frame is not None:
+            qr_codes = scan_qr_codes(full_frame)
+            if qr_codes:
+                frame = full_frame
+                reduced = False
+
+    if qr_codes:
+        print(f"\n🔍 [{timestamp}] Found {len(qr_codes)} QR code(s)!")
+
+        for qr in qr_codes:
+            qr_data = qr['data']
+
+            if not should_process_qr(qr_data):
+                print(f"⏭️  Skipping (recently scanned)")
+                continue
+
+            qr_count += 1
+            print(f"\n{'='*60}")
+            print(f"QR #{qr_count}")
+            print(f"{'='*60}")
+            print(f"📋 Type: {qr['type']}")
+            print(f"📝 Data: {qr_data}")
+
+            is_url = is_valid_url(qr_data)
+
+            if is_url:
+                print(f"🌐 Detected: URL")
+                if AUTO_OPEN_URLS:
+                    open_url(qr_data)
+            else:
+                print(f"ℹ️  Detected: Text/Data")
+
+            if SEND_TO_WEB:
+                send_to_website(qr_data, qr['type'], is_url)
+
+            print(f"{'='*60}\n")
+
+        if SHOW_PREVIEW and frame.ndim == 2:
+            # Lazy re-decode in color, only now that there is something
+            # worth drawing; same reduction factor keeps coords aligned
+            color_frame = decode_frame(frame_base64, cv2.IMREAD_REDUCED_COLOR_2)
+            if color_frame is not None and color_frame.shape[:2] == frame.shape[:2]:
+                frame = color_frame
+
+        frame = draw_qr_codes(frame, qr_codes)
+    else:
+        if frame_count % 20 == 0:
+            print(f"⏳ [{timestamp}] Scanning... (frame {frame_count})")
+
+    if SHOW_PREVIEW:
+        # Show the preview at half the sensor resolution - reduced
+        # decodes arrive at that size already, so only full-resolution
+        # retry frames need the downscale
+        if reduced:
+            disp = frame
+        else:
+            disp = cv2.resize(frame, (frame.shape[1] // 2, frame.shape[0] // 2),
+                              interpolation=cv2.INTER_NEAREST)
+
+        # Add status overlay (kept short so it fits a half-VGA preview)
+        status = f"Frames: {frame_count} | QR: {qr_count}"
+        cv2.putText(disp, status, (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+
+        # Add instructions (pre-rendered sprite)
+        height, width = disp.shape[:2]
+        if height >= 20 and width >= 210:
+            sprite = INSTRUCTIONS_IMG if disp.ndim == 3 else INSTRUCTIONS_IMG_GRAY
+            disp[height - 20:height, 10:210] = sprite
+
+        if not show_preview(disp):
+            return qr_count, False
+
+    return qr_count, True
+
+def preview_worker():
+    """Display frames from the preview queue on a dedicated thread"""
+    while not STOP_EVENT.is_set():
+        try:
+            frame = PREVIEW_QUEUE.get(timeout=0.5)
+        except queue.Empty:
+            continue
+
+        cv2.imshow(WINDOW_NAME, frame)
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            print("\n👋 Quitting...")
+            STOP_EVENT.set()
+
+    cv2.destroyAllWindows()
+
+def show_preview(frame):
+    """Hand a frame to the preview; returns False once 'q' was pressed"""
+    if not PREVIEW_THREADED:
+        cv2.imshow(WINDOW_NAME, frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            print("\n👋 Quitting...")
+            return False
+        return True
+
+    # Keep at most one pending frame - drop the stale one rather than
+    # letting the GUI backlog stall the scanner
+    try:
+        PREVIEW_QUEUE.get_nowait()
+    except queue.Empty:
+        pass
+    PREVIEW_QUEUE.put(frame)
+
+    return not STOP_EVENT.is_set()
 
 def main():
     """Main scanner loop"""
     print("=" * 70)
     print("🎥 ESP32-CAM QR Code Scanner with Web Integration")
     print("=" * 70)
-    print(f"📡 Monitoring: {FIREBASE_URL}{CAMERA_PATH}")
-    print(f"⏱️  Check interval: {CHECK_INTERVAL}s")
+    print(f"📡 Monitoring: {CAMERA_URL}")
+    print(f"⏱️  Fallback poll interval: {CHECK_INTERVAL}s")
     print(f"🔍 Preview: {'Enabled' if SHOW_PREVIEW else 'Disabled'}")
     print(f"🌐 Auto-open URLs: {'Enabled' if AUTO_OPEN_URLS else 'Disabled'}")
     print(f"📤 Send to website: {'Enabled' if SEND_TO_WEB else 'Disabled'}")
     print(f"⏳ Scan cooldown: {SCAN_COOLDOWN}s")
     print("=" * 70)
     print("\n👁️  Waiting for camera frames...\n")
-    
+
+    if SEND_TO_WEB:
+        threading.Thread(target=send_worker, daemon=True).start()
+
+    if SHOW_PREVIEW and PREVIEW_THREADED:
+        threading.Thread(target=preview_worker, daemon=True).start()
+
     last_timestamp = None
+    last_frame_fp = None
+    last_frame_base64 = None
     frame_count = 0
     qr_count = 0
-    
+    running = True
+    next_deadline = time.monotonic()
+
     try:
-        while True:
+        # STOP_EVENT is checked as well as `running` so pressing 'q' in
+        # the threaded preview quits even while no frames are arriving
+        while running and not STOP_EVENT.is_set():
+            # Long-lived stream - wakes only when Firebase pushes a frame.
+            # Frames are pulled with next() so only stream I/O sits inside
+            # the try; errors from frame processing surface where they occur
+            stream = stream_camera_frames()
+            stream_error = None
+
+            while running and not STOP_EVENT.is_set():
+                try:
+                    frame_base64, timestamp = next(stream)
+                except StopIteration:
+                    break
+                except (requests.RequestException, orjson.JSONDecodeError) as e:
+                    stream_error = e
+                    break
+
+                if timestamp == last_timestamp:
+                    continue
+
+                # Firebase re-emits identical frames on reconnect.
+                # An O(1) fingerprint (length + head/tail sample)
+                # rejects changed payloads without touching the
+                # whole string; only a fingerprint match pays for
+                # the full comparison
+                fp = (len(frame_base64),
+                      hash(frame_base64[:256]) ^ hash(frame_base64[-256:]))
+                if fp == last_frame_fp and frame_base64 == last_frame_base64:
+                    last_timestamp = timestamp
+                    continue
+
+                frame_count += 1
+                last_timestamp = timestamp
+                last_frame_fp = fp
+                last_frame_base64 = frame_base64
+
+                qr_count, running = process_frame(frame_base64, timestamp,
+                                                  frame_count, qr_count)
+
+                if frame_count % 100 == 0:
+                    clean_old_qrs()
+
+            if not running or STOP_EVENT.is_set():
+                break
+
+            if stream_error is not None:
+                print(f"⚠️  Stream disconnected ({stream_error}), "
+                      f"polling until it recovers...")
+
+            # Single fallback poll, then try to re-establish the stream
             frame_base64, timestamp = fetch_camera_frame()
-            
+
             if frame_base64 and timestamp != last_timestamp:
-                frame_count += 1
                 last_timestamp = timestamp
-                
-                frame = decode_frame(frame_base64)
-                
-                if frame is not None:
-                    qr_codes = scan_qr_codes(frame)
-                    
-                    if qr_codes:
-                        print(f"\n🔍 [{timestamp}] Found {len(qr_codes)} QR code(s)!")
-                        
-                        for qr in qr_codes:
-                            qr_data = qr['data']
-                            
-                            if not should_process_qr(qr_data):
-                                print(f"⏭️  Skipping (recently scanned)")
-                                continue
-                            
-                            qr_count += 1
-                            print(f"\n{'='*60}")
-                            print(f"QR #{qr_count}")
-                            print(f"{'='*60}")
-                            print(f"📋 Type: {qr['type']}")
-                            print(f"📝 Data: {qr_data}")
-                            
-                            is_url = is_valid_url(qr_data)
-                            
-                            if is_url:
-                                print(f"🌐 Detected: URL")
-                                if AUTO_OPEN_URLS:
-                                    open_url(qr_data)
-                            else:
-                                print(f"ℹ️  Detected: Text/Data")
-                            
-                            if SEND_TO_WEB:
-                                send_to_website(qr_data, qr['type'], is_url)
-                            
-                            print(f"{'='*60}\n")
-                        
-                        frame = draw_qr_codes(frame, qr_codes)
-                    else:
-                        if frame_count % 20 == 0:
-                            print(f"⏳ [{timestamp}] Scanning... (frame {frame_count})")
-                    
-                    if SHOW_PREVIEW:
-                        # Add status overlay
-                        status = f"Frames: {frame_count} | QR Detected: {qr_count}"
-                        cv2.putText(frame, status, (10, 30),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-                        
-                        # Add instructions
-                        cv2.putText(frame, "Press 'Q' to quit", (10, frame.shape[0] - 10),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-                        
-                        cv2.imshow('ESP32-CAM QR Scanner', frame)
-                        
-                        if cv2.waitKey(1) & 0xFF == ord('q'):
-                            print("\n👋 Quitting...")
-                            break
-            
-            if frame_count % 100 == 0:
-                clean_old_qrs()
-            
-            time.sleep(CHECK_INTERVAL)
-    
+
+                fp = (len(frame_base64),
+                      hash(frame_base64[:256]) ^ hash(frame_base64[-256:]))
+                if fp != last_frame_fp or frame_base64 != last_frame_base64:
+                    frame_count += 1
+                    last_frame_fp = fp
+                    last_frame_base64 = frame_base64
+
+                    qr_count, running = process_frame(frame_base64, timestamp,
+                                                      frame_count, qr_count)
+
+                    if frame_count % 100 == 0:
+                        clean_old_qrs()
+
+            # Sleep toward an absolute deadline so the poll cadence
+            # stays at CHECK_INTERVAL regardless of decode time
+            next_deadline += CHECK_INTERVAL
+            delay = next_deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_deadline = time.monotonic()
+
     except KeyboardInterrupt:
         print("\n\n⚠️  Interrupted by user")
     
     finally:
-        if SHOW_PREVIEW:
+        STOP_EVENT.set()
+        if SHOW_PREVIEW and not PREVIEW_THREADED:
             cv2.destroyAllWindows()
         print(f"\n✅ Scanner stopped")
         print(f"📊 Statistics:")